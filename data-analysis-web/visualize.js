@@ -5,8 +5,12 @@ const apiUrlFileList = 'https://j88641zc71.execute-api.us-east-2.amazonaws.com/i
 
 let fileNameTable = document.getElementById('file-names');
 let fileData = {}
+let timelineData = {}
 let responseObj = {}
 
+// The number of steps that each point in the timeline chart covers
+const timelineWindow = 10;
+
 // Start by requesting all of the files that are available to analyze
 fetch(apiUrlFileList)
 .then(response => {
@@ -86,6 +90,24 @@ function addFile(idName) {
                 buildPlot();
             }
         });
+
+        // Get the rolling step metrics through the file for the timeline chart
+        fetch(apiUrlFile + "/timeline?window=" + timelineWindow)
+        .then(response => {
+            return response.json();
+        })
+        .then(data => {
+            // Don't add the timeline if the file was removed while we were waiting for it, or if the file
+            // has fewer steps than the window (there's nothing to show)
+            if (addRemoveCell.innerHTML != "+" && data.time.length > 0) {
+                timelineData[fileName] = data;
+                buildTimelinePlot();
+            }
+        })
+        // The API sends back "Bad Data" (which isn't JSON) if no steps were found in the file
+        .catch(error => {
+            console.log(`No timeline for ${fileName}: ${error}`);
+        });
     
     // We need to add the file to the list of files to analyze
     } else {
@@ -96,6 +118,8 @@ function addFile(idName) {
         addRemoveRow = document.getElementById(addRemoveRowId);
         addRemoveRow.style.backgroundColor = "white";
         delete fileData[fileName];
+        delete timelineData[fileName];
+        buildTimelinePlot();
         // Clear out the file info table (we're going to rebuild it)
         document.getElementById("chart").replaceChildren();
         let fileInfoTable = document.getElementById("file-info");
@@ -229,6 +253,85 @@ function buildPlot() {
 
 }
 
+// Build the timeline chart - this shows how the selected metric changes through each file
+function buildTimelinePlot() {
+    document.getElementById("timeline-chart").replaceChildren();
+    if (Object.keys(timelineData).length == 0) {
+        return;
+    }
+    let metric = document.getElementById("timeline-metric").value;
+
+    // Build a line for each file (the pitch and roll ranges have two lines per file - the max and the min)
+    // The time is converted from seconds to minutes
+    let lines = [];
+    for (let file of Object.keys(timelineData)) {
+        let data = timelineData[file];
+        let isRange = metric == "pitch_range" || metric == "roll_range";
+        let metricLines = isRange ? data[metric] : [data[metric]];
+        let names = isRange ? [file + " Max", file + " Min"] : [file];
+        for (let i = 0; i < metricLines.length; i++) {
+            lines.push({
+                name: names[i],
+                points: data.time.map(function(time, j) {
+                    return {time: time / 60, value: metricLines[i][j]};
+                })
+            });
+        }
+    }
+    let allPoints = lines.flatMap(line => line.points);
+
+    //Set the margins for the chart (the legend goes below the chart with a row for each line)
+    let legendRowHeight = 20;
+    let margin = {top: 20, right: 80, bottom: 40 + legendRowHeight * lines.length, left: 50},
+        width = 700 - margin.left - margin.right,
+        height = 250 - margin.top - 30;
+
+    // Set the x-range based on the time data and the y-range based on the metric data
+    let x = d3.scaleLinear()
+        .domain(d3.extent(allPoints, d => d.time))
+        .range([0, width]);
+    let y = d3.scaleLinear()
+        .domain(d3.extent(allPoints, d => d.value))
+        .range([height, 0]);
+
+    // Create a different color for each line
+    var color = d3.scaleOrdinal(d3.schemeCategory10)
+        .domain(lines.map(metricLine => metricLine.name));
+
+    var line = d3.line()
+        .x(function(d) { return x(d.time); })
+        .y(function(d) { return y(d.value); });
+
+    // Create the svg object and add the x (minutes) and y axes
+    var svg = d3.select("#timeline-chart").append("svg")
+        .attr("width", width + margin.left + margin.right)
+        .attr("height", height + margin.top + margin.bottom)
+        .append("g")
+        .attr("transform", "translate(" + margin.left + "," + margin.top + ")");
+    svg.append("g")
+        .attr("class", "x axis")
+        .attr("transform", "translate(0," + height + ")")
+        .call(d3.axisBottom().scale(x).tickFormat(d3.format('.1f')));
+    svg.append("g")
+        .attr("class", "y axis")
+        .call(d3.axisLeft().scale(y));
+    svg.append("text").attr("x", width + 5).attr("y", height).text("Minutes").style("font-size", "12px").attr("alignment-baseline","middle");
+
+    // Add each line to the chart, and its color/name to the legend
+    for (let i = 0; i < lines.length; i++) {
+        let metricLine = lines[i];
+        svg.append("path")
+            .datum(metricLine.points)
+            .attr("class", "line")
+            .style("stroke", color(metricLine.name))
+            .attr("d", line);
+
+        let legendY = height + 40 + legendRowHeight * i;
+        svg.append("circle").attr("cx", 10).attr("cy", legendY).attr("r", 6).style("fill", color(metricLine.name));
+        svg.append("text").attr("x", 30).attr("y", legendY).text(metricLine.name).style("font-size", "15px").attr("alignment-baseline","middle");
+    }
+}
+
 // Build the file info table
 function buildFileInfo() {
     // The headers for the table (and the type of data that each row will include):
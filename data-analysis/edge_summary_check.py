@@ -0,0 +1,140 @@
+# Checks the on-device step summaries (imu-collection/src/step_summary.py) against the server analysis
+#
+# The example data is fed through a fake BNO08X one reading at a time (the same way the microcontroller
+# reads it while recording), and the step metrics from the on-device summaries are compared against the
+# metrics from the same peak/trough analysis the read Lambda function does.  It also reports how many
+# bytes edge mode saves when uploading.
+
+import csv
+import json
+import math
+import sys
+import numpy as np
+
+sys.path.append('../imu-collection/src')
+from step_summary import StepDetector, quaternion_to_pitch_roll
+from parameter_sweep import find_steps
+
+# Same as CONST_TRACE_DECIMATION in imu-collection/src/code.py
+trace_decimation = 10
+
+
+# Stands in for the BNO08X - it turns the pitch/roll/yaw readings from the example data back into
+# the quaternions the real sensor would have reported
+class FakeBNO:
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.position = 0
+
+    @property
+    def quaternion(self):
+        _, pitch, roll, yaw = self.rows[self.position]
+        self.position += 1
+        half_pitch = math.radians(pitch) / 2
+        half_roll = math.radians(roll) / 2
+        half_yaw = math.radians(yaw) / 2
+        cp, sp = math.cos(half_pitch), math.sin(half_pitch)
+        cr, sr = math.cos(half_roll), math.sin(half_roll)
+        cy, sy = math.cos(half_yaw), math.sin(half_yaw)
+        quat_i = sp * cr * cy - cp * sr * sy
+        quat_j = cp * sr * cy + sp * cr * sy
+        quat_k = cp * cr * sy - sp * sr * cy
+        quat_real = cp * cr * cy + sp * sr * sy
+        return quat_i, quat_j, quat_k, quat_real
+
+
+# The step analysis from the read Lambda function (parameter_sweep.py has the shared version of it)
+# Returns the steps as [start time, end time, foot down time, max pitch, min pitch, max roll, min roll] rows
+def server_steps(time_data, pitch_data, roll_data):
+    steps = find_steps(time_data, pitch_data, roll_data)
+    if steps is None:
+        return []
+    return np.column_stack([steps['start_time'], steps['end_time'], steps['foot_down_time'], steps['start_pitch'],
+                            steps['trough_pitch'], steps['roll_max'], steps['roll_min']])
+
+
+def step_metrics(steps):
+    if len(steps) == 0:
+        return {'step_count': 0}
+    steps = np.array(steps)
+    return {
+        'step_count': len(steps),
+        'step_time_average': round(np.mean(steps[:,1] - steps[:,0]), 2),
+        'step_time_std_dev': round(np.std(steps[:,1] - steps[:,0]), 2),
+        'foot_down_time_average': round(np.mean(steps[:,2]), 2),
+        'foot_down_time_std_dev': round(np.std(steps[:,2]), 2),
+        'average_pitch_range': [float(round(np.mean(steps[:,3]), 1)), float(round(np.mean(steps[:,4]), 1))],
+        'average_roll_range': [float(round(np.mean(steps[:,5]), 1)), float(round(np.mean(steps[:,6]), 1))],
+    }
+
+
+def read_rows(file_name):
+    rows = []
+    with open(file_name, newline='') as csvfile:
+        reader = csv.reader(csvfile, delimiter=',', quotechar='"')
+        for row in reader:
+            rows.append([float(row[0]) / 1000000000, float(row[1]), float(row[2]), float(row[3])])
+    return rows
+
+
+# The BNO08X sometimes reports the same reading again, so the highest/lowest reading of a step can be repeated
+# after a small dip (e.g. -70, -69.5, -70).  find_peaks reports each repeat as its own peak/trough, so copy the
+# reading at the trough (or start peak) of the middle step of a recording 2 readings later with a small dip between.
+def repeat_reading(rows, point, dip):
+    ankle_data = np.array(rows)
+    steps = find_steps(ankle_data[:,0], ankle_data[:,1], ankle_data[:,2])
+    step = len(steps['start_index']) // 2
+    if point == 'trough':
+        index = int(np.flatnonzero(ankle_data[:,0] == steps['start_time'][step] + steps['foot_down_time'][step])[0])
+    else:
+        index = int(steps['start_index'][step])
+    rows = [list(row) for row in rows]
+    rows[index + 1][1:] = [rows[index][1] + dip] + rows[index][2:]
+    rows[index + 2][1:] = rows[index][1:]
+    return rows
+
+
+right_rows = read_rows('../example-data/right-foot.csv')
+recordings = [
+    ('../example-data/left-foot.csv', read_rows('../example-data/left-foot.csv')),
+    ('../example-data/right-foot.csv', right_rows),
+    ('right-foot.csv with a repeated trough reading', repeat_reading(right_rows, 'trough', 0.5)),
+    ('right-foot.csv with a repeated peak reading', repeat_reading(right_rows, 'peak', -0.5)),
+]
+
+all_match = True
+for file_name, rows in recordings:
+    # Record the example data the way code.py does in edge mode
+    bno = FakeBNO(rows)
+    detector = StepDetector()
+    device_steps = []
+    raw_bytes = 0
+    upload_bytes = 0
+    for sample in range(len(rows)):
+        quat_i, quat_j, quat_k, quat_real = bno.quaternion
+        line_time = rows[sample][0]
+        raw_bytes += len(json.dumps([line_time, quat_i, quat_j, quat_k, quat_real]))
+        if sample % trace_decimation == 0:
+            upload_bytes += len(json.dumps([line_time, quat_i, quat_j, quat_k, quat_real]))
+
+        pitch, roll = quaternion_to_pitch_roll(quat_i, quat_j, quat_k, quat_real)
+        step = detector.update(line_time, pitch, roll)
+        if step is not None:
+            device_steps.append(step)
+            upload_bytes += len(json.dumps([round(value, 3) for value in step]))
+    upload_bytes += len(json.dumps(detector.profile()))
+
+    ankle_data = np.array(rows)
+    expected = step_metrics(server_steps(ankle_data[:,0], ankle_data[:,1], ankle_data[:,2]))
+    actual = step_metrics(device_steps)
+
+    print(file_name)
+    for metric in expected:
+        match = expected[metric] == actual[metric]
+        all_match = all_match and match
+        print(f"  {metric}: server {expected[metric]} device {actual[metric]}{'' if match else '  <-- MISMATCH'}")
+    print(f"  Upload bytes: {raw_bytes} raw, {upload_bytes} edge mode ({raw_bytes - upload_bytes} saved, {100 * (1 - upload_bytes / raw_bytes):.1f}%)")
+
+if not all_match:
+    sys.exit("Device step metrics do not match the server analysis")
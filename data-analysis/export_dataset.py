@@ -0,0 +1,332 @@
+# Exports every session into a partitioned columnar (Parquet) dataset for offline research
+#
+# Rather than pulling files one at a time from GET /items/{id} (or reading loose CSV files), every session is
+# written once into two tables, partitioned by foot and date:
+#   <dataset>/samples/foot=left/date=2024-03-05/<file-name>.parquet - the time, pitch, and roll of every reading
+#   <dataset>/steps/foot=left/date=2024-03-05/<file-name>.parquet   - one row per step with its metrics
+# Parquet stores min/max statistics for every column of every row group, so a query like "left foot, March,
+# steps with a foot down time > 0.7s" only opens the left foot March partitions and skips any row groups
+# that can't match.
+#
+# Only sessions that are new (or have had more data added) since the last export are exported - the sessions
+# that have been exported are kept in <dataset>/_exported.json.  When exporting from DynamoDB, sessions that have
+# been deleted from the table are removed from the dataset.
+#
+# Examples:
+#   python export_dataset.py dataset --table foot-imu-data
+#   python export_dataset.py dataset --csv ../example-data/left-foot.csv ../example-data/right-foot.csv \
+#       --benchmark --foot right --start-date 2024-03-01 --end-date 2024-04-01 --min-foot-down-time 0.7
+
+import argparse
+import datetime
+import json
+import os
+import time as tm
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from parameter_sweep import find_steps
+
+TABLES = ['samples', 'steps']
+PARTITIONING = ds.partitioning(pa.schema([('foot', pa.string()), ('date', pa.string())]), flavor='hive')
+
+SAMPLES_SCHEMA = pa.schema([
+    ('file_name', pa.string()),
+    ('time', pa.float64()),
+    ('pitch', pa.float32()),
+    ('roll', pa.float32()),
+])
+# The roll in the steps table is converted for right feet (the same as the read Lambda function) so steps
+# can be compared between feet - the samples table has the roll as it was recorded
+STEPS_SCHEMA = pa.schema([
+    ('file_name', pa.string()),
+    ('step', pa.int32()),
+    ('start_time', pa.float64()),
+    ('end_time', pa.float64()),
+    ('step_time', pa.float32()),
+    ('foot_down_time', pa.float32()),
+    ('pitch_max', pa.float32()),
+    ('pitch_min', pa.float32()),
+    ('roll_max', pa.float32()),
+    ('roll_min', pa.float32()),
+])
+
+# The file name is the same on every row so it's dictionary encoded.  The float columns are stored with
+# byte stream split encoding, which makes them compress much better with zstd.
+WRITE_OPTIONS = {
+    'compression': {'file_name': 'snappy', 'time': 'zstd', 'pitch': 'zstd', 'roll': 'zstd', 'step': 'zstd',
+                    'start_time': 'zstd', 'end_time': 'zstd', 'step_time': 'zstd', 'foot_down_time': 'zstd',
+                    'pitch_max': 'zstd', 'pitch_min': 'zstd', 'roll_max': 'zstd', 'roll_min': 'zstd'},
+    'use_dictionary': ['file_name'],
+    'use_byte_stream_split': ['time', 'pitch', 'roll', 'start_time', 'end_time', 'step_time', 'foot_down_time',
+                              'pitch_max', 'pitch_min', 'roll_max', 'roll_min'],
+    'write_statistics': True,
+}
+ROW_GROUP_SIZE = 10000
+
+
+# Read the items (files) from the DynamoDB table.  The table is first scanned without the data (a scan only returns
+# up to 1MB at a time) and then the data is only read for the files that haven't already been exported.
+# Returns the names of every file in the table and the items that need to be exported
+def dynamodb_items(table_name, manifest=None):
+    import boto3
+    table = boto3.resource('dynamodb').Table(table_name)
+    manifest = manifest or {}
+    scan_arguments = {
+        #Because there are hyphens in the column names, we need to use a ProjectionExpression
+        'ProjectionExpression': '#fn, #points, #version',
+        'ExpressionAttributeNames': {'#fn': 'file-name', '#points': 'data-points', '#version': 'version'},
+    }
+    file_list = []
+    while True:
+        response = table.scan(**scan_arguments)
+        file_list += response['Items']
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_arguments['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    file_names = [file_info['file-name'] for file_info in file_list]
+    items = (table.get_item(Key={'file-name': file_info['file-name']})['Item']
+             for file_info in file_list if not is_exported(manifest, file_info))
+    return file_names, items
+
+
+# Build items in the same form as the DynamoDB table from CSV files like the example data
+# The CSV files don't have a start time so the time the file was last modified is used
+def csv_items(file_names, time_divisor):
+    for file_name in file_names:
+        ankle_data = np.loadtxt(file_name, delimiter=',', ndmin=2)
+        ankle_data[:,0] /= time_divisor
+        yield {
+            'file-name': os.path.basename(file_name),
+            'start-time': int(os.path.getmtime(file_name) * 1000),
+            'data-points': len(ankle_data),
+            'data': json.dumps(ankle_data[:,:3].tolist()),
+        }
+
+
+# The foot and date partition that an item (file) belongs in
+def item_partition(item):
+    foot = "left" if item['file-name'][0:4] == "left" else "right"
+    start_time = datetime.datetime.fromtimestamp(int(item['start-time']) / 1000, datetime.timezone.utc)
+    return foot, start_time.strftime('%Y-%m-%d')
+
+
+# Read the readings (time, pitch, roll) stored in an item's (file's) JSON data
+def item_readings(item):
+    return np.array(json.loads(item['data']), dtype=float).reshape(-1, 3)
+
+
+# Find the steps for an item (file) from its readings
+# Each step is [start time, end time, foot down time, max pitch, min pitch, max roll, min roll]
+def item_step_table(item, ankle_data):
+    file_name = item['file-name']
+
+    # Files recorded in edge mode already have their steps found on the device (and only a decimated
+    # trace of the readings, so we can't find the steps from the samples)
+    if 'steps' in item:
+        step_table = np.array(json.loads(item['steps']), dtype=float).reshape(-1, 7)
+        if file_name[0:4] != "left":
+            step_table[:,[5, 6]] = -step_table[:,[6, 5]]
+        return step_table
+
+    roll_data = ankle_data[:,2] if file_name[0:4] == "left" else -ankle_data[:,2]
+    steps = find_steps(ankle_data[:,0], ankle_data[:,1], roll_data)
+    if steps is None:
+        return np.zeros((0, 7))
+    return np.column_stack([steps['start_time'], steps['end_time'], steps['foot_down_time'],
+                            steps['start_pitch'], steps['trough_pitch'], steps['roll_max'], steps['roll_min']])
+
+
+# Build the samples and steps tables for an item (file)
+def item_tables(item):
+    file_name = item['file-name']
+    ankle_data = item_readings(item)
+    samples = pa.table({
+        'file_name': pa.array([file_name] * len(ankle_data), pa.string()),
+        'time': ankle_data[:,0],
+        'pitch': ankle_data[:,1].astype(np.float32),
+        'roll': ankle_data[:,2].astype(np.float32),
+    }, schema=SAMPLES_SCHEMA)
+
+    step_table = item_step_table(item, ankle_data)
+    steps = pa.table({
+        'file_name': pa.array([file_name] * len(step_table), pa.string()),
+        'step': np.arange(len(step_table), dtype=np.int32),
+        'start_time': step_table[:,0],
+        'end_time': step_table[:,1],
+        'step_time': (step_table[:,1] - step_table[:,0]).astype(np.float32),
+        'foot_down_time': step_table[:,2].astype(np.float32),
+        'pitch_max': step_table[:,3].astype(np.float32),
+        'pitch_min': step_table[:,4].astype(np.float32),
+        'roll_max': step_table[:,5].astype(np.float32),
+        'roll_min': step_table[:,6].astype(np.float32),
+    }, schema=STEPS_SCHEMA)
+    return samples, steps
+
+
+# Whether an item (file) has already been exported with all of its current data
+# The data store Lambda adds one to an item's version every time it stores part of the file - the data points aren't
+# enough, since edge mode step uploads don't add any.  CSV files and items stored before the version was added only
+# have the data points to go on.
+def is_exported(manifest, item):
+    file_name = item['file-name']
+    if file_name not in manifest:
+        return False
+    if 'version' in item:
+        return manifest[file_name].get('version') == int(item['version'])
+    return 'version' not in manifest[file_name] and manifest[file_name]['data-points'] == int(item['data-points'])
+
+
+def read_manifest(dataset_dir):
+    manifest_name = os.path.join(dataset_dir, '_exported.json')
+    if not os.path.exists(manifest_name):
+        return {}
+    with open(manifest_name) as fp:
+        return json.load(fp)
+
+
+# Remove an exported file from the dataset (and the manifest)
+def remove_export(manifest, dataset_dir, file_name):
+    for table_name in TABLES:
+        old_path = os.path.join(dataset_dir, table_name, manifest[file_name]['path'])
+        if os.path.exists(old_path):
+            os.remove(old_path)
+    del manifest[file_name]
+
+
+# Export the items (files) that are new or have changed since the last export
+# If source_file_names (every file in the source) is given, exported files that aren't in it anymore are removed
+# Returns the number of files that were exported and the number that were removed
+def export(items, dataset_dir, source_file_names=None):
+    manifest = read_manifest(dataset_dir)
+    exported = 0
+    for item in items:
+        if is_exported(manifest, item):
+            continue
+        file_name = item['file-name']
+        foot, date = item_partition(item)
+
+        # If more data has been added to the file since it was exported, remove the old export first
+        if file_name in manifest:
+            remove_export(manifest, dataset_dir, file_name)
+
+        partition_path = os.path.join(f"foot={foot}", f"date={date}", file_name + ".parquet")
+        for table_name, table in zip(TABLES, item_tables(item)):
+            output_path = os.path.join(dataset_dir, table_name, partition_path)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            pq.write_table(table, output_path, row_group_size=ROW_GROUP_SIZE, **WRITE_OPTIONS)
+
+        manifest[file_name] = {'data-points': int(item['data-points']), 'path': partition_path}
+        if 'version' in item:
+            manifest[file_name]['version'] = int(item['version'])
+        exported += 1
+
+    # Remove the files that have been deleted from the source (e.g. through DELETE /items/{id})
+    removed = 0
+    if source_file_names is not None:
+        source_file_names = set(source_file_names)
+        for file_name in [file_name for file_name in manifest if file_name not in source_file_names]:
+            remove_export(manifest, dataset_dir, file_name)
+            removed += 1
+
+    # Write the manifest once everything has been exported
+    os.makedirs(dataset_dir, exist_ok=True)
+    with open(os.path.join(dataset_dir, '_exported.json'), 'w') as fp:
+        json.dump(manifest, fp, indent=1)
+    return exported, removed
+
+
+# Query the samples or steps table - only the partitions for the requested foot/dates are read, and only the row
+# groups whose min/max statistics can match the filter
+#   foot: "left" or "right" (or None for both)
+#   start_date/end_date: "YYYY-MM-DD" - the end date isn't included (so March 2024 is "2024-03-01", "2024-04-01")
+#   where: a pyarrow expression, e.g. ds.field('foot_down_time') > 0.7
+#   columns: the columns to read (or None for all of them)
+def query(dataset_dir, table_name='steps', foot=None, start_date=None, end_date=None, where=None, columns=None):
+    table_dir = os.path.join(dataset_dir, table_name)
+    if not os.path.exists(table_dir):
+        return (SAMPLES_SCHEMA if table_name == 'samples' else STEPS_SCHEMA).empty_table()
+    dataset = ds.dataset(table_dir, format='parquet', partitioning=PARTITIONING)
+
+    expression = None
+    conditions = []
+    if foot is not None:
+        conditions.append(ds.field('foot') == foot)
+    if start_date is not None:
+        conditions.append(ds.field('date') >= start_date)
+    if end_date is not None:
+        conditions.append(ds.field('date') < end_date)
+    if where is not None:
+        conditions.append(where)
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    return dataset.to_table(columns=columns, filter=expression)
+
+
+# Compare a query on the dataset against finding the same steps from the JSON items (files) without it - the only way
+# to do that is to read the JSON data of every item for the foot/dates and find its steps.  The items are already in
+# memory, so this doesn't include the time it takes to read them from DynamoDB.
+def benchmark(items, dataset_dir, foot, start_date, end_date, min_foot_down_time):
+    read_time = 0
+    find_time = 0
+    scan_steps = 0
+    for item in items:
+        item_foot, date = item_partition(item)
+        if (foot is not None and item_foot != foot) or (start_date is not None and date < start_date) \
+                or (end_date is not None and date >= end_date):
+            continue
+        start = tm.perf_counter()
+        ankle_data = None if 'steps' in item else item_readings(item)
+        read_time += tm.perf_counter() - start
+        start = tm.perf_counter()
+        step_table = item_step_table(item, ankle_data)
+        scan_steps += int(np.sum(step_table[:,2] > min_foot_down_time))
+        find_time += tm.perf_counter() - start
+
+    start = tm.perf_counter()
+    steps = query(dataset_dir, 'steps', foot, start_date, end_date, ds.field('foot_down_time') > min_foot_down_time)
+    query_time = tm.perf_counter() - start
+
+    print(f"JSON items: {scan_steps} steps in {read_time + find_time:.3f}s "
+          f"({read_time:.3f}s reading the JSON data, {find_time:.3f}s finding the steps)")
+    print(f"Dataset query: {steps.num_rows} steps in {query_time:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every session into a partitioned Parquet dataset")
+    parser.add_argument('dataset', help="Directory to export the dataset to")
+    parser.add_argument('--table', help="DynamoDB table to export (e.g. foot-imu-data)")
+    parser.add_argument('--csv', nargs='+', default=[], help="CSV files to export (time, pitch, roll, ...)")
+    parser.add_argument('--time-divisor', type=float, default=1000000000,
+                        help="Divide the CSV times by this to get seconds (the example data is in nanoseconds)")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Compare querying the dataset for steps against scanning every item")
+    parser.add_argument('--foot', choices=['left', 'right'], help="Benchmark query: foot")
+    parser.add_argument('--start-date', help="Benchmark query: first date (YYYY-MM-DD)")
+    parser.add_argument('--end-date', help="Benchmark query: date after the last date (YYYY-MM-DD)")
+    parser.add_argument('--min-foot-down-time', type=float, default=0.7, help="Benchmark query: foot down time (s)")
+    args = parser.parse_args()
+
+    # The benchmark needs every item, otherwise we only need to read the items that haven't been exported
+    # (the CSV files given aren't every file, so exported files are only removed when exporting from DynamoDB)
+    if args.table:
+        source_file_names, items = dynamodb_items(args.table, None if args.benchmark else read_manifest(args.dataset))
+        items = list(items)
+    else:
+        source_file_names = None
+        items = list(csv_items(args.csv, args.time_divisor))
+
+    start = tm.perf_counter()
+    exported, removed = export(items, args.dataset, source_file_names)
+    print(f"Exported {exported} of {len(items)} files and removed {removed} deleted files in {tm.perf_counter() - start:.2f}s")
+
+    if args.benchmark:
+        benchmark(items, args.dataset, args.foot, args.start_date, args.end_date, args.min_foot_down_time)
+
+
+if __name__ == '__main__':
+    main()
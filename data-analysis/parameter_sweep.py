@@ -0,0 +1,217 @@
+# Sweeps the step detection parameters across a set of recordings
+#
+# The step rules (the prominence of the peaks/troughs, the peak/trough pitch limits, and the step time
+# limits) were determined empirically.  Rather than re-running the whole analysis for every combination,
+# the peaks and troughs for each recording are found once at the lowest prominence in the grid (scipy also
+# gives us the prominence of each one, so higher prominences are just a filter on these), and then every
+# combination of the limits is checked at once using numpy masks over the candidate steps.
+#
+# Example (the defaults are the values used by the read Lambda function):
+#   python parameter_sweep.py ../example-data/left-foot.csv ../example-data/right-foot.csv \
+#       --prominence 0.5 1 2 --peak-min-pitch 0 5 10 --trough-max-pitch -40 -50 -60 --output sweep.csv
+#
+# The output has one row per parameter set and recording with the step count and the step metrics,
+# including the coefficient of variation (std dev / average) of the step and foot down times, which
+# shows how stable the metrics are for that parameter set.
+
+import argparse
+import csv
+import itertools
+import os
+import time as tm
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.signal import find_peaks
+
+PARAMETERS = ['prominence', 'peak_min_pitch', 'trough_max_pitch', 'step_time_min', 'step_time_max']
+METRICS = ['step_count', 'step_time_average', 'step_time_std_dev', 'step_time_cv',
+           'foot_down_time_average', 'foot_down_time_std_dev', 'foot_down_time_cv', 'percent_time_foot_down',
+           'pitch_max_average', 'pitch_min_average', 'roll_max_average', 'roll_min_average']
+
+
+# Read a recording in the same format as the example data (time, pitch, roll, ...)
+def read_recording(file_name, time_divisor):
+    ankle_data = np.loadtxt(file_name, delimiter=',', ndmin=2)
+    time_data = ankle_data[:,0] / time_divisor
+    pitch_data = ankle_data[:,1]
+
+    # We need to convert the roll data for right feet so that steps can be compared between right and left
+    # feet (this is the same as the read Lambda function)
+    if os.path.basename(file_name)[0:4] == "left":
+        roll_data = ankle_data[:,2]
+    else:
+        roll_data = -ankle_data[:,2]
+    return time_data, pitch_data, roll_data
+
+
+# Find every peak and trough that could be part of a step at the lowest prominence in the grid
+# Returns the index, whether it's a peak, and the prominence of each one (sorted by index)
+def find_candidates(pitch_data, min_prominence):
+    peaks, peak_properties = find_peaks(pitch_data, prominence=min_prominence)
+    troughs, trough_properties = find_peaks(-pitch_data, prominence=min_prominence)
+    indexes = np.concatenate([peaks, troughs])
+    order = np.argsort(indexes, kind='stable')
+    is_peak = np.concatenate([np.ones(len(peaks), dtype=bool), np.zeros(len(troughs), dtype=bool)])[order]
+    prominences = np.concatenate([peak_properties['prominences'], trough_properties['prominences']])[order]
+    return indexes[order], is_peak, prominences
+
+
+# Find every peak-trough-peak pattern in the peaks/troughs that meet a prominence - these are the steps
+# before the pitch and step time limits are applied
+def candidate_steps(time_data, pitch_data, roll_data, indexes, is_peak):
+    if len(indexes) < 3:
+        return None
+    start = np.flatnonzero(is_peak[:-2] & ~is_peak[1:-1] & is_peak[2:])
+    if len(start) == 0:
+        return None
+    start_index = indexes[start]
+    trough_index = indexes[start + 1]
+    end_index = indexes[start + 2]
+
+    # The max/min roll angle between the start and end of each step - the steps never overlap (one step
+    # ends at the peak the next one starts at) so these can be found with a single reduceat each
+    bounds = np.column_stack([start_index, end_index]).ravel()
+    roll_max = np.maximum.reduceat(roll_data, bounds)[::2]
+    roll_min = np.minimum.reduceat(roll_data, bounds)[::2]
+
+    return {
+        'start_index': start_index,
+        'end_index': end_index,
+        'start_time': time_data[start_index],
+        'end_time': time_data[end_index],
+        'start_pitch': pitch_data[start_index],
+        'trough_pitch': pitch_data[trough_index],
+        'end_pitch': pitch_data[end_index],
+        'step_time': time_data[end_index] - time_data[start_index],
+        'foot_down_time': time_data[trough_index] - time_data[start_index],
+        'roll_max': roll_max,
+        'roll_min': roll_min,
+    }
+
+
+# Find the steps in a recording for a single set of parameters (the defaults are the values used by the read Lambda function)
+# Returns the same columns as candidate_steps (or None if there aren't any steps)
+def find_steps(time_data, pitch_data, roll_data, prominence=1, peak_min_pitch=5, trough_max_pitch=-50,
+               step_time_min=0.5, step_time_max=2):
+    indexes, is_peak, _ = find_candidates(pitch_data, prominence)
+    steps = candidate_steps(time_data, pitch_data, roll_data, indexes, is_peak)
+    if steps is None:
+        return None
+    mask = ((steps['start_pitch'] >= peak_min_pitch) & (steps['trough_pitch'] <= trough_max_pitch)
+            & (steps['end_pitch'] >= peak_min_pitch)
+            & (steps['step_time'] >= step_time_min) & (steps['step_time'] <= step_time_max))
+    return {column: values[mask] for column, values in steps.items()}
+
+
+# Calculate the step metrics for every parameter set (rows of grid) at once
+# Each row of the mask is a parameter set and each column is a candidate step
+def grid_metrics(steps, grid):
+    rows = len(grid)
+    if steps is None:
+        metrics = {metric: np.full(rows, np.nan) for metric in METRICS}
+        metrics['step_count'] = np.zeros(rows, dtype=int)
+        return metrics
+
+    mask = ((steps['start_pitch'] >= grid[:,1,None])
+            & (steps['trough_pitch'] <= grid[:,2,None])
+            & (steps['end_pitch'] >= grid[:,1,None])
+            & (steps['step_time'] >= grid[:,3,None])
+            & (steps['step_time'] <= grid[:,4,None]))
+    weights = mask.astype(float)
+    step_count = mask.sum(axis=1)
+
+    # Sums and sums of squares give the average and (population) std dev of each metric for every row
+    with np.errstate(invalid='ignore', divide='ignore'):
+        def average(values):
+            return weights @ values / step_count
+
+        def std_dev(values, values_average):
+            return np.sqrt(np.maximum(weights @ (values * values) / step_count - values_average * values_average, 0))
+
+        step_time_average = average(steps['step_time'])
+        step_time_std_dev = std_dev(steps['step_time'], step_time_average)
+        foot_down_time_average = average(steps['foot_down_time'])
+        foot_down_time_std_dev = std_dev(steps['foot_down_time'], foot_down_time_average)
+        return {
+            'step_count': step_count,
+            'step_time_average': step_time_average,
+            'step_time_std_dev': step_time_std_dev,
+            'step_time_cv': step_time_std_dev / step_time_average,
+            'foot_down_time_average': foot_down_time_average,
+            'foot_down_time_std_dev': foot_down_time_std_dev,
+            'foot_down_time_cv': foot_down_time_std_dev / foot_down_time_average,
+            'percent_time_foot_down': foot_down_time_average / step_time_average * 100,
+            'pitch_max_average': average(steps['start_pitch']),
+            'pitch_min_average': average(steps['trough_pitch']),
+            'roll_max_average': average(steps['roll_max']),
+            'roll_min_average': average(steps['roll_min']),
+        }
+
+
+# Run every parameter set in the grid against one recording
+def sweep_recording(file_name, grid, time_divisor):
+    time_data, pitch_data, roll_data = read_recording(file_name, time_divisor)
+    indexes, is_peak, prominences = find_candidates(pitch_data, grid[:,0].min())
+
+    results = []
+    # Each prominence only changes which peaks/troughs are used, so we build the candidate steps once per
+    # prominence and then check all of the other limits together
+    for prominence in np.unique(grid[:,0]):
+        rows = np.flatnonzero(grid[:,0] == prominence)
+        keep = prominences >= prominence
+        steps = candidate_steps(time_data, pitch_data, roll_data, indexes[keep], is_peak[keep])
+        metrics = grid_metrics(steps, grid[rows])
+        for i, row in enumerate(rows):
+            result = {'file_name': file_name, 'parameter_set': int(row)}
+            result.update({parameter: grid[row, j] for j, parameter in enumerate(PARAMETERS)})
+            result.update({metric: metrics[metric][i] for metric in METRICS})
+            results.append(result)
+    return results
+
+
+def build_grid(args):
+    return np.array(list(itertools.product(args.prominence, args.peak_min_pitch, args.trough_max_pitch,
+                                           args.step_time_min, args.step_time_max)), dtype=float)
+
+
+# Run the grid against every recording (in parallel across recordings)
+def sweep(file_names, grid, time_divisor=1000000000, workers=None):
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(sweep_recording, file_name, grid, time_divisor) for file_name in file_names]
+        for future in futures:
+            results += future.result()
+    results.sort(key=lambda result: (result['parameter_set'], result['file_name']))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the step detection parameters across recordings")
+    parser.add_argument('files', nargs='+', help="Recording CSV files (time, pitch, roll, ...)")
+    parser.add_argument('--prominence', type=float, nargs='+', default=[1])
+    parser.add_argument('--peak-min-pitch', type=float, nargs='+', default=[5])
+    parser.add_argument('--trough-max-pitch', type=float, nargs='+', default=[-50])
+    parser.add_argument('--step-time-min', type=float, nargs='+', default=[0.5])
+    parser.add_argument('--step-time-max', type=float, nargs='+', default=[2])
+    parser.add_argument('--time-divisor', type=float, default=1000000000,
+                        help="Divide the recorded times by this to get seconds (the example data is in nanoseconds)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of processes (defaults to the CPU count)")
+    parser.add_argument('--output', default='sweep.csv')
+    args = parser.parse_args()
+
+    grid = build_grid(args)
+    start = tm.perf_counter()
+    results = sweep(args.files, grid, args.time_divisor, args.workers)
+    elapsed = tm.perf_counter() - start
+
+    with open(args.output, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['parameter_set', 'file_name'] + PARAMETERS + METRICS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+    print(f"{len(grid)} parameter sets x {len(args.files)} recordings in {elapsed:.2f}s - written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
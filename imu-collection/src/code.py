@@ -18,6 +18,7 @@ import json
 
 from adafruit_bno08x import BNO_REPORT_ROTATION_VECTOR
 from adafruit_bno08x.i2c import BNO08X_I2C
+from step_summary import StepDetector, quaternion_to_pitch_roll
 
 # Bitbangio is used instead of busio because the BNO08X IMU does not implement the I2C
 # protocol correctly (it violates I2C's SDA-high to SCL-high setup-time requirement)
@@ -33,6 +34,12 @@ bno.enable_feature(BNO_REPORT_ROTATION_VECTOR)
 # data is saved (and also the file name that's used in the API upload)
 CONST_FOOT = "left"
 
+# In edge mode steps are found on the device while recording, and only a summary of each step (plus
+# every CONST_TRACE_DECIMATION-th reading) is uploaded instead of every reading.  This makes uploads
+# much faster and saves battery on long recordings.
+CONST_EDGE_MODE = False
+CONST_TRACE_DECIMATION = 10
+
 # Set up the file name to store data to. This includes a file number that is based on the number of existing
 # data files (to cause it to increment), plus a random component (to differentiate once files are removed
 # from the device and file numbers repeat)
@@ -40,6 +47,10 @@ new_file_name = ""
 while new_file_name == "" or new_file_name in os.listdir('/data/'):
     new_file_name = f"{CONST_FOOT}-{len(os.listdir('/data/')):07d}-{random.randint(100000,999999)}.csv"
 
+# In edge mode the step summaries and the average step are stored in files alongside the data file
+steps_file_name = new_file_name[:-4] + "-steps.csv"
+profile_file_name = new_file_name[:-4] + "-profile.json"
+
 print("Writing output to:", new_file_name)
 print("Waiting for start button")
 
@@ -79,6 +90,15 @@ pixel.fill((0, 255, 0))
 # when they're analyzing the data in the web UI to help them find the right file.
 start_time = time.monotonic()
 
+# Used in edge mode to find steps while recording, and to track how many bytes edge mode saves
+detector = StepDetector()
+sample_count = 0
+raw_bytes = 0
+saved_bytes = 0
+steps_fp = None
+if CONST_EDGE_MODE:
+    steps_fp = open("/data/" + steps_file_name, "a")
+
 # Main recording loop
 with open("/data/" + new_file_name, "a") as fp:
         while started:
@@ -94,10 +114,29 @@ with open("/data/" + new_file_name, "a") as fp:
                 break
 
             # Store the current time and the quaternion readings
-            output_string = f"{time.monotonic()},{quat_i},{quat_j},{quat_k},{quat_real}"
-            fp.write(output_string + "\n")
+            line_time = time.monotonic()
+            output_string = f"{line_time},{quat_i},{quat_j},{quat_k},{quat_real}"
             print(output_string)
 
+            if not CONST_EDGE_MODE:
+                fp.write(output_string + "\n")
+            else:
+                # Only keep every CONST_TRACE_DECIMATION-th reading as the raw trace
+                raw_bytes += len(output_string) + 1
+                if sample_count % CONST_TRACE_DECIMATION == 0:
+                    fp.write(output_string + "\n")
+                else:
+                    saved_bytes += len(output_string) + 1
+                sample_count += 1
+
+                # Check if this reading completed a step - if so, store the step summary
+                pitch, roll = quaternion_to_pitch_roll(quat_i, quat_j, quat_k, quat_real)
+                step = detector.update(line_time, pitch, roll)
+                if step is not None:
+                    step_string = ",".join([f"{value:.3f}" for value in step])
+                    steps_fp.write(step_string + "\n")
+                    saved_bytes -= len(step_string) + 1
+
             # Check if the button has been pressed - if so, stop the recording
             if not button.value:
                 started=False
@@ -105,6 +144,16 @@ with open("/data/" + new_file_name, "a") as fp:
 # The pixel is set red once recording stops
 pixel.fill((255, 0, 0))
 
+# In edge mode store the average step across the whole recording (this is uploaded with the step summaries)
+if CONST_EDGE_MODE:
+    steps_fp.close()
+    profile = detector.profile()
+    if profile is not None:
+        with open("/data/" + profile_file_name, "w") as fp:
+            json.dump({'pitch': profile[0], 'roll': profile[1]}, fp)
+    print("Steps found:", detector.step_count)
+    print("Upload bytes saved:", saved_bytes, "of", raw_bytes)
+
 # Below is code to get the current time from a web API
 # It is heavily based on a tutorial from AdaFruit: https://learn.adafruit.com/adafruit-magtag/getting-the-date-time
 
@@ -188,6 +237,28 @@ try:
         response = requests.post("https://j88641zc71.execute-api.us-east-2.amazonaws.com/items", json=request_object)
         print(response.text)
         request_object['data'] = []
+        request_object['data_points'] = 0
+
+        # If this file was recorded in edge mode, send the step summaries (also in 500 row chunks)
+        # followed by the average step
+        file_steps_name = file_name[:-4] + "-steps.csv"
+        file_profile_name = file_name[:-4] + "-profile.json"
+        if file_steps_name in os.listdir('/data/'):
+            request_object['steps'] = []
+            steps_file = open("/data/" + file_steps_name, "r")
+            for line in steps_file.readlines():
+                request_object['steps'].append([float(value) for value in str.split(str.strip(line), ",")])
+                if len(request_object['steps']) >= 500:
+                    response = requests.post("https://j88641zc71.execute-api.us-east-2.amazonaws.com/items", json=request_object)
+                    print(response.text)
+                    request_object['steps'] = []
+                    time.sleep(1)
+
+            if file_profile_name in os.listdir('/data/'):
+                with open("/data/" + file_profile_name, "r") as fp:
+                    request_object['profile'] = json.load(fp)
+            response = requests.post("https://j88641zc71.execute-api.us-east-2.amazonaws.com/items", json=request_object)
+            print(response.text)
 
     # If we sent data for all the files without error, remove the list of unsaved files
     os.remove('/data/unsaved_file_list.csv')
@@ -0,0 +1,215 @@
+# Streaming step detection that runs on the microcontroller while data is being recorded
+#
+# This follows the same step rules as the data read Lambda function (web-api/data-read-lambda-api)
+# but works on one reading at a time, so the microcontroller can summarize each step as it happens
+# and upload the summaries instead of every quaternion.  It only uses the math and array modules so it
+# runs under both CircuitPython and regular Python (which is how we check it against the server analysis
+# - see data-analysis/edge_summary_check.py).
+
+import math
+from array import array
+
+# These match the values used by the server analysis (see lambda_function.py)
+# A peak/trough has to stand out from the surrounding readings by PROMINENCE degrees to count
+PROMINENCE = 1
+# The peak pitch must be >= 5 degrees and the trough pitch must be <= -50 degrees to be considered a step
+PEAK_MIN_PITCH = 5
+TROUGH_MAX_PITCH = -50
+# Steps must take between 0.5 and 2 seconds (60 - 240 spm)
+STEP_TIME_MIN = 0.5
+STEP_TIME_MAX = 2
+# The number of pieces each step is broken into when building the average step
+PROFILE_PIECES = 20
+
+# The number of recent readings we keep so we can look back over a step once it's been found.  At ~35
+# readings a second this is ~14 seconds, well over the 2 second step limit.  Preallocating these arrays
+# means we don't allocate any memory per reading while recording.  Times are kept as doubles so that the
+# average step pieces line up exactly with the server's.
+BUFFER_SIZE = 512
+
+
+# Convert a quaternion reading from the BNO08X to the pitch and roll angles (in degrees) that the rest
+# of the system uses.  This is the same conversion the data store Lambda function does, and the angles
+# are returned in the same order that they're stored in the database (and analyzed in the read Lambda)
+def quaternion_to_pitch_roll(quat_i, quat_j, quat_k, quat_real):
+    pitch = math.atan2(2 * (quat_real * quat_i + quat_j * quat_k), 1 - 2 * (quat_i * quat_i + quat_j * quat_j))
+    # Clamp to avoid a math domain error from floating point rounding
+    sin_roll = 2 * (quat_real * quat_j - quat_k * quat_i)
+    roll = math.asin(max(-1.0, min(1.0, sin_roll)))
+    return math.degrees(pitch), math.degrees(roll)
+
+
+# Finds steps one reading at a time.  Peaks and troughs are found by following the pitch until it turns
+# around by at least PROMINENCE degrees, and a step is a peak-trough-peak pattern that meets the same limits as
+# the server analysis.  This gives the same peaks/troughs as scipy's find_peaks with the same prominence except
+# when the highest (or lowest) reading is repeated before the pitch turns around (e.g. -70, -69.5, -70, which
+# happens when the BNO08X reports the same reading again).  find_peaks reports each repeat as its own peak/trough,
+# so we keep track of the first and last repeat: a repeated peak ends the previous step at the first repeat and
+# starts the next step at the last repeat, and a repeated trough isn't a peak-trough-peak pattern so the step is
+# skipped (the same as the server).  The readings are compared before the data store Lambda rounds them, so
+# readings that only match after rounding can still give different steps.
+class StepDetector:
+
+    def __init__(self, buffer_size=BUFFER_SIZE, profile_pieces=PROFILE_PIECES):
+        self.buffer_size = buffer_size
+        self.times = array('d', [0] * buffer_size)
+        self.pitches = array('f', [0] * buffer_size)
+        self.rolls = array('f', [0] * buffer_size)
+        # Total number of readings seen so far (the index of the next reading)
+        self.count = 0
+
+        # Which kind of turning point we're currently looking for
+        # 0 = we don't know yet, 1 = looking for a peak, -1 = looking for a trough
+        self.direction = 0
+        self.high = None
+        self.low = None
+        # The current peak/trough candidate - first_start/first_end cover the first flat top (the same reading
+        # repeated) and last_start/last_end cover the last time the same reading was repeated after it
+        self.candidate = 0
+        self.first_start = 0
+        self.first_end = 0
+        self.last_start = 0
+        self.last_end = 0
+
+        # The most recently confirmed peak (index, pitch) and trough (index, pitch, whether it was repeated)
+        self.last_peak = None
+        self.last_trough = None
+
+        # Running totals used to build the average step (the same 20 pieces the server uses)
+        self.profile_pieces = profile_pieces
+        self.pitch_sums = array('f', [0] * profile_pieces)
+        self.roll_sums = array('f', [0] * profile_pieces)
+        self.piece_counts = array('L', [0] * profile_pieces)
+        self.step_count = 0
+
+    # Add a reading - this returns a step summary if the reading completed a step, otherwise None
+    # A step summary is (start time, end time, foot down time, max pitch, min pitch, max roll, min roll)
+    def update(self, time, pitch, roll):
+        index = self.count
+        position = index % self.buffer_size
+        self.times[position] = time
+        self.pitches[position] = pitch
+        self.rolls[position] = roll
+        self.count += 1
+
+        step = None
+
+        # At the start we don't know if we're heading towards a peak or a trough, so wait until the
+        # readings have moved by more than the prominence and then follow that direction
+        if self.direction == 0:
+            if self.high is None or pitch > self.high:
+                self.high = pitch
+            if self.low is None or pitch < self.low:
+                self.low = pitch
+            if self.high - self.low >= PROMINENCE:
+                self.direction = 1 if pitch == self.high else -1
+                self._new_candidate(pitch, index)
+
+        # Looking for a peak - once the pitch has dropped far enough below the highest reading, that reading is a peak
+        elif self.direction == 1:
+            if pitch > self.candidate:
+                self._new_candidate(pitch, index)
+            elif pitch == self.candidate:
+                self._repeated_candidate(index)
+            elif self.candidate - pitch >= PROMINENCE:
+                step = self._found_peak((self.first_start + self.first_end) // 2,
+                                        (self.last_start + self.last_end) // 2, self.candidate)
+                self.direction = -1
+                self._new_candidate(pitch, index)
+
+        # Looking for a trough - once the pitch has risen far enough above the lowest reading, that reading is a trough
+        else:
+            if pitch < self.candidate:
+                self._new_candidate(pitch, index)
+            elif pitch == self.candidate:
+                self._repeated_candidate(index)
+            elif pitch - self.candidate >= PROMINENCE:
+                self.last_trough = ((self.first_start + self.first_end) // 2, self.candidate,
+                                    self.last_start != self.first_start)
+                self.direction = 1
+                self._new_candidate(pitch, index)
+
+        return step
+
+    def _new_candidate(self, pitch, index):
+        self.candidate = pitch
+        self.first_start = index
+        self.first_end = index
+        self.last_start = index
+        self.last_end = index
+
+    # The reading is the same as the current candidate - either it's part of a flat top or the same reading
+    # has come back again after dipping (by less than the prominence)
+    def _repeated_candidate(self, index):
+        if self.last_end == index - 1:
+            if self.first_start == self.last_start:
+                self.first_end = index
+            self.last_end = index
+        else:
+            self.last_start = index
+            self.last_end = index
+
+    # A peak was found - check whether it completes a peak-trough-peak step with the previous peak and trough
+    # The step ends at the first repeat of the peak and the next step starts at the last repeat
+    def _found_peak(self, index, next_index, pitch):
+        last_peak = self.last_peak
+        last_trough = self.last_trough
+        self.last_peak = (next_index, pitch)
+        if last_peak is None or last_trough is None or last_trough[0] < last_peak[0]:
+            return None
+
+        start_index, start_pitch = last_peak
+        trough_index, trough_pitch, trough_repeated = last_trough
+        if trough_repeated:
+            return None
+
+        # If the previous peak is no longer in the buffer the step is far too long anyway
+        if start_index < self.count - self.buffer_size:
+            return None
+
+        if start_pitch < PEAK_MIN_PITCH or trough_pitch > TROUGH_MAX_PITCH or pitch < PEAK_MIN_PITCH:
+            return None
+
+        size = self.buffer_size
+        start_time = self.times[start_index % size]
+        end_time = self.times[index % size]
+        step_time = end_time - start_time
+        if step_time > STEP_TIME_MAX or step_time < STEP_TIME_MIN:
+            return None
+
+        #Now we know it's a step!
+
+        # Find the max/min roll angle for this step
+        roll_max = self.rolls[start_index % size]
+        roll_min = roll_max
+        for i in range(start_index + 1, index):
+            roll = self.rolls[i % size]
+            if roll > roll_max:
+                roll_max = roll
+            if roll < roll_min:
+                roll_min = roll
+
+        # Put each reading in the step into the matching piece of the average step
+        piece_time = step_time / (self.profile_pieces - 1)
+        for i in range(start_index, index + 1):
+            piece = min(int((self.times[i % size] - start_time) / piece_time), self.profile_pieces - 1)
+            self.pitch_sums[piece] += self.pitches[i % size]
+            self.roll_sums[piece] += self.rolls[i % size]
+            self.piece_counts[piece] += 1
+
+        self.step_count += 1
+        foot_down_time = self.times[trough_index % size] - start_time
+        return (start_time, end_time, foot_down_time, start_pitch, trough_pitch, roll_max, roll_min)
+
+    # The average pitch and roll for each piece of the step across all of the steps found so far
+    # Returns None if no steps have been found (pieces that didn't get any readings are None)
+    def profile(self):
+        if self.step_count == 0:
+            return None
+        pitch = []
+        roll = []
+        for i in range(self.profile_pieces):
+            count = self.piece_counts[i]
+            pitch.append(self.pitch_sums[i] / count if count else None)
+            roll.append(self.roll_sums[i] / count if count else None)
+        return pitch, roll
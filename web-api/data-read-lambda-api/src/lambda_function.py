@@ -2,6 +2,9 @@
 # The AWS API Gateway should point the following routings to this Lambda function:
 # GET /items
 # GET /items/{id}
+# GET /items/{id}/timeline
+# GET /items/{id}/steps
+# GET /items/{id}/steps/{k}
 
 # This function is written in Python so that we can access the numpy and scipy libraries
 # to do analysis on the data points before we send them to the web UI
@@ -20,6 +23,393 @@ logger.setLevel(logging.INFO)
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table('foot-imu-data')
 
+# Only the timeline for the window the web UI uses is cached with each item (file) - items already hold all of
+# the data and DynamoDB limits them to 400KB
+TIMELINE_CACHE_WINDOW = 10
+
+# The columns of the step table (see detect_steps)
+STEP_TABLE_COLUMNS = ['start_time', 'end_time', 'foot_down_time', 'pitch_max', 'pitch_min', 'roll_max', 'roll_min']
+
+# Each item (file) has a step index stored with it so single steps can be read without finding all of the steps
+# again.  Each row is a step: the readings it starts/ends at, where those readings are in the item's JSON data,
+# and the same values as the step table.
+STEP_INDEX_DTYPE = np.dtype([
+    ('start', '<i4'), ('trough', '<i4'), ('end', '<i4'), ('data_start', '<i4'), ('data_end', '<i4'),
+    ('start_time', '<f8'), ('end_time', '<f8'), ('foot_down_time', '<f4'),
+    ('pitch_max', '<f4'), ('pitch_min', '<f4'), ('roll_max', '<f4'), ('roll_min', '<f4'),
+])
+
+
+# Convert the data for a file into time, pitch, and roll numpy arrays that we can assess
+def read_ankle_data(file_name, ankle_data_raw):
+    logger.info(type(ankle_data_raw))
+    ankle_data = np.array(ankle_data_raw)
+    logger.info("Ankle Data:")
+    logger.info(type(ankle_data))
+    logger.info(ankle_data.shape)
+    time_data = ankle_data[:,0]
+    pitch_data = ankle_data[:,1]
+
+    # We need to convert the roll data for right feet so that steps can be
+    # compared between right and left feet (we want an outside roll to always
+    # have the same cardinality regardless of which foot it is)
+    if file_name[0:4] == "left":
+        roll_data = ankle_data[:,2]
+    else:
+        roll_data = -ankle_data[:,2]
+
+    return time_data, pitch_data, roll_data
+
+
+# Find the steps in the time, pitch, and roll data for a file (recorded with every reading)
+# Returns the step table and the indexes of the [start peak, trough, end peak] readings of each step
+def detect_steps(time_data, pitch_data, roll_data):
+    # Smooth out the pitch readings and then calculate the peaks and troughs in the pitch
+    # reading - we'll use these to calculate each step
+    smoothed_pitch = scipy.ndimage.gaussian_filter1d(pitch_data, sigma=2)
+    peaks, _ = find_peaks(pitch_data, prominence=1)
+    troughs, _ = find_peaks(-pitch_data, prominence=1)
+    
+    # Create an array of points that includes the index of each peak/trough and whether it is a peak or trough
+    points = [[int(time), "peak"] for time in peaks]
+    points += [[int(time), "trough"] for time in troughs]
+    # Sort this by index of the peak/trough
+    points.sort(key=lambda x:x[0])
+    
+    steps = []
+    step_start_times = []
+    total_step_times = []
+    foot_down_times = []
+    pitch_max = []
+    pitch_min = []
+    roll_max = []
+    roll_min = []
+    
+    # We'll review the points to find steps
+    for i in range(len(points) - 2):
+        # We'll only consider steps as starting at a peak (this makes the analysis easier)
+        if points[i][1] == "trough":
+            continue
+
+        # We're going to determine steps by looking at the next three points
+        point_num, point_type = points[i]
+        point_time = time_data[point_num]
+        point_value = pitch_data[point_num]
+
+        next_num, next_type = points[i + 1]
+        next_time = time_data[next_num]
+        next_value = pitch_data[next_num]
+
+        two_num, two_type = points[i + 2]
+        two_time = time_data[two_num]
+        two_value = pitch_data[two_num]
+
+        # We'll define a steps as a peak-trough-peak pattern - if any of these are not met then skip
+        # to the next point
+        if point_type == "trough" or next_type == "peak" or two_type == "trough":
+            continue
+
+        # The peak pitch must be >= 5 degrees and the trough pitch must be <= -50 degrees to be considered a step
+        # This was determined imperically
+        if point_value < 5 or next_value > -50 or two_value < 5:
+            continue
+
+        # Check if the step is between 2 second and 0.5 seconds
+        # Note - here step actually refers to two steps since we're only looking at data from one leg
+        # This means that we're making sure the user is walking between 60 and 240 spm
+        # Anything not in this range we won't consider a step (it's too inconcistent to get good data out of)
+        step_time = two_time - point_time
+        #The time was too fast or short to be a step
+        if step_time > 2 or step_time < 0.5:
+            continue
+
+        #Now we know it's a step!
+
+        # Find and store the total time for the step, and the amount of time the foot was down
+        # We're assuming that the foot is down between the peak and trough of the pitch
+
+        # During the step your foot's pitch goes from it's maximum angle (when you start the step)
+        # to it's minimum angle (when your foot leaves the ground and the step-off happens)
+        steps.append((point_num, next_num, two_num))
+        step_start_times.append(point_time)
+        total_step_times.append(step_time)
+        foot_down_times.append(next_time - point_time)
+
+        # Find and store the max/min roll angle for this step
+        roll_max.append(np.max(roll_data[point_num:two_num]))
+        roll_min.append(np.min(roll_data[point_num:two_num]))
+
+        # Find and store the max/min pitch angle for this step
+        pitch_max.append(point_value)
+        pitch_min.append(next_value)
+
+    # Put the steps in a table with a row for each step: [start time, end time, foot down time, max pitch, min pitch,
+    # max roll, min roll] - this is the same as the steps that are summarized on the device in edge mode
+    step_table = np.array([step_start_times, np.add(step_start_times, total_step_times), foot_down_times,
+                           pitch_max, pitch_min, roll_max, roll_min], dtype=float).T
+
+    return step_table, np.array(steps, dtype=int).reshape(-1, 3)
+
+
+# Find the steps in the data for a file (recorded with every reading) and calculate the average step
+def find_steps(file_name, item):
+    # Read in the data and find the steps
+    time_data, pitch_data, roll_data = read_ankle_data(file_name, json.loads(item['data']))
+    step_table, boundaries = detect_steps(time_data, pitch_data, roll_data)
+
+    # Get the pitch, roll, and time data for each step - we're going to use this to calculate the "average" step
+    step_values = [pitch_data[start:end+1] for start, _, end in boundaries]
+    roll_values = [roll_data[start:end+1] for start, _, end in boundaries]
+    step_times = [time_data[start:end+1] for start, _, end in boundaries]
+
+    # We're going to break each step down into 20 pieces and then calculate the average pitch/roll across all steps
+    # for each of those pieces.  This will allow us to later graph the average across all steps
+    average_number_of_pieces = 20
+    # We create empty lists to store the average pitch and roll data
+    pitch_average = [[] for _ in range(average_number_of_pieces)]
+    roll_average = [[] for _ in range(average_number_of_pieces)]
+
+    # Go through each point of each step and put it into the appropriate interval bucket in pitch_average and roll_average
+    for i in range(len(step_values)):
+        start_step_time = step_times[i][0]
+        end_step_time = step_times[i][-1]
+        step_amount = (end_step_time - start_step_time) / (average_number_of_pieces - 1)
+        for j in range(len(step_values[i])):
+            curr_time = step_times[i][j] - start_step_time
+            list_element = int(curr_time / step_amount)
+            pitch_average[list_element].append(step_values[i][j])
+            roll_average[list_element].append(roll_values[i][j])
+    
+    # Calculate the average of all of the steps in each pitch_average and roll_average interval
+    for i in range(len(pitch_average)):
+        pitch_average[i] = sum(pitch_average[i]) / len(pitch_average[i])
+        roll_average[i] = sum(roll_average[i]) / len(roll_average[i])
+
+    return step_table, pitch_average, roll_average
+
+
+# Read the steps for a file that was recorded in edge mode - these were already found on the device while
+# recording (see imu-collection/src/step_summary.py) so we only need to read in the step summaries and average step
+def read_edge_steps(file_name, item):
+    step_table = read_edge_step_table(file_name, item)
+    profile = json.loads(item['profile'])
+    pitch_average = profile['pitch']
+    roll_average = profile['roll']
+
+    # We need to convert the roll data for right feet the same way as find_steps does
+    if file_name[0:4] != "left":
+        roll_average = [-roll for roll in roll_average]
+
+    return step_table, pitch_average, roll_average
+
+
+# Read the step summaries for a file that was recorded in edge mode (without the average step)
+def read_edge_step_table(file_name, item):
+    # Each step is [start time, end time, foot down time, max pitch, min pitch, max roll, min roll]
+    step_table = np.array(json.loads(item['steps']), dtype=float).reshape(-1, 7)
+
+    # We need to convert the roll data for right feet the same way as find_steps does (this swaps the max and min)
+    if file_name[0:4] != "left":
+        step_table[:,[5, 6]] = -step_table[:,[6, 5]]
+
+    return step_table
+
+
+# Find the steps for a file, using the steps found on the device if it was recorded in edge mode
+def get_steps(file_name, item):
+    if 'steps' in item:
+        return read_edge_steps(file_name, item)
+    return find_steps(file_name, item)
+
+
+# Find the step table for a file without calculating the average step
+def get_step_table(file_name, item):
+    if 'steps' in item:
+        return read_edge_step_table(file_name, item)
+    time_data, pitch_data, roll_data = read_ankle_data(file_name, json.loads(item['data']))
+    step_table, _ = detect_steps(time_data, pitch_data, roll_data)
+    return step_table
+
+
+# The condition for storing something we calculated for an item (file) back with it - it's only stored if the file
+# hasn't changed since we read it.  The data store Lambda adds one to the version every time it stores part of the
+# file (the data points aren't enough - edge mode step uploads don't add any).
+# Returns the condition expression and its values
+def unchanged_condition(item):
+    if 'version' in item:
+        return '#version = :version', {':version': item['version']}
+    return 'attribute_not_exists(#version)', {}
+
+
+# Find where each reading starts and ends in an item's JSON data ("[[time,pitch,roll],[time,pitch,roll],...]")
+# The readings are the only lists inside the outer list, so these are just the positions of the inner brackets
+def reading_offsets(data):
+    characters = np.frombuffer(data.encode(), dtype=np.uint8)
+    starts = np.flatnonzero(characters == ord('['))[1:]
+    ends = np.flatnonzero(characters == ord(']'))[:-1] + 1
+    return starts, ends
+
+
+# Read the readings between two positions in an item's JSON data (from reading_offsets) without reading the rest of it
+def read_readings(data, data_start, data_end):
+    return json.loads('[' + data[data_start:data_end] + ']')
+
+
+# Build step index rows from a step table and the [start peak, trough, end peak] readings of each step
+def build_step_index(step_table, boundaries, starts, ends):
+    index = np.zeros(len(step_table), dtype=STEP_INDEX_DTYPE)
+    index['start'] = boundaries[:,0]
+    index['trough'] = boundaries[:,1]
+    index['end'] = boundaries[:,2]
+    index['data_start'] = starts[boundaries[:,0]]
+    index['data_end'] = ends[boundaries[:,2]]
+    for column, name in enumerate(STEP_TABLE_COLUMNS):
+        index[name] = step_table[:,column]
+    return index
+
+
+# Read the step index stored with an item (file) - DynamoDB returns binary attributes wrapped in a Binary object
+def read_step_index(item):
+    if 'step-index' not in item:
+        return np.zeros(0, dtype=STEP_INDEX_DTYPE)
+    raw_index = item['step-index']
+    return np.frombuffer(bytes(getattr(raw_index, 'value', raw_index)), dtype=STEP_INDEX_DTYPE).copy()
+
+
+# Whether the step index stored with an item (file) covers all of its data (and steps, for edge mode files)
+# The data store Lambda adds one to the version every time it stores part of the file
+def step_index_is_current(item):
+    return 'step-index-version' in item and int(item['step-index-version']) == int(item.get('version', 0))
+
+
+# Bring the step index for an item (file) up to date with its data
+def update_step_index(file_name, item):
+    data = item['data']
+    starts, ends = reading_offsets(data)
+
+    # Files recorded in edge mode already have their steps, so we just need to find the readings they start
+    # and end at in the (decimated) data
+    if 'steps' in item:
+        step_table = read_edge_step_table(file_name, item)
+        # Each step covers the first reading at/after its start to the last reading at/before its end (the trough
+        # is the first reading at/after it, but never after the end if there aren't any readings between them)
+        time_data = np.array(json.loads(data), dtype=float).reshape(-1, 3)[:,0]
+        start = np.searchsorted(time_data, step_table[:,0])
+        end = np.maximum(np.searchsorted(time_data, step_table[:,1], side='right') - 1, start)
+        trough = np.minimum(np.searchsorted(time_data, step_table[:,0] + step_table[:,2]), end)
+        boundaries = np.clip(np.column_stack([start, trough, end]), 0, max(len(time_data) - 1, 0))
+        return build_step_index(step_table, boundaries, starts, ends)
+
+    # Adding data to the end of a file doesn't change the steps before the last step in the index, so we only
+    # need to look for steps after those.  We start from the trough of the second to last step - this keeps the
+    # peak that the last step starts at (a peak can't be found at the very start of the data).
+    index = read_step_index(item)
+    if len(index) >= 2:
+        first = int(index['trough'][-2])
+    else:
+        first = 0
+    index = index[:-1]
+
+    ankle_data_raw = read_readings(data, starts[first], ends[-1]) if len(starts) > first else []
+    time_data, pitch_data, roll_data = read_ankle_data(file_name, np.array(ankle_data_raw, dtype=float).reshape(-1, 3))
+    step_table, boundaries = detect_steps(time_data, pitch_data, roll_data)
+    return np.concatenate([index, build_step_index(step_table, boundaries + first, starts, ends)])
+
+
+# Get an item (file) and its step index.  Only the index is read from the table unless the index needs to be
+# built/updated (or the data is requested) - an updated index is stored with the item.
+# Returns None, None if the item doesn't exist
+def get_step_index(file_name, with_data=False):
+    attribute_names = {'#fn': 'file-name', '#version': 'version', '#idx': 'step-index', '#idxv': 'step-index-version'}
+    if with_data:
+        attribute_names['#data'] = 'data'
+    file_info = table.get_item(
+        Key={'file-name': file_name},
+        ProjectionExpression=', '.join(attribute_names.keys()),
+        ExpressionAttributeNames=attribute_names
+    )
+    if 'Item' not in file_info:
+        return None, None
+    item = file_info['Item']
+    if step_index_is_current(item):
+        return item, read_step_index(item)
+
+    item = table.get_item(Key={'file-name': file_name})['Item']
+    index = update_step_index(file_name, item)
+    condition, values = unchanged_condition(item)
+    values[':idx'] = index.tobytes()
+    values[':idxv'] = item.get('version', 0)
+    try:
+        # update_item creates the item if it doesn't exist, so make sure the file wasn't deleted since we read it
+        table.update_item(
+            Key={'file-name': file_name},
+            UpdateExpression='SET #idx = :idx, #idxv = :idxv',
+            ConditionExpression='attribute_exists(#fn) AND ' + condition,
+            ExpressionAttributeNames={
+                '#idx': 'step-index',
+                '#idxv': 'step-index-version',
+                '#fn': 'file-name',
+                '#version': 'version'
+            },
+            ExpressionAttributeValues=values
+        )
+    except Exception as error:
+        logger.info("Step index not stored: " + str(error))
+    return item, index
+
+
+# The information about a step in the step index that we send to the web UI
+def step_info(index, k):
+    step = index[k]
+    return {
+        'step': k,
+        'start_time': round(float(step['start_time']), 3),
+        'end_time': round(float(step['end_time']), 3),
+        'step_time': round(float(step['end_time'] - step['start_time']), 2),
+        'foot_down_time': round(float(step['foot_down_time']), 2),
+        'pitch_range': [round(float(step['pitch_max']), 1), round(float(step['pitch_min']), 1)],
+        'roll_range': [round(float(step['roll_max']), 1), round(float(step['roll_min']), 1)],
+    }
+
+
+# Calculate rolling step metrics for every window of `window` consecutive steps, so changes within a
+# session (like fatigue or changes in pace) can be seen.  Every metric is calculated from running totals
+# of the values (and their squares) so the whole timeline takes the same time no matter how big the window is.
+def step_timeline(step_table, window):
+    total_step_times = step_table[:,1] - step_table[:,0]
+    # Step time, foot down time, max/min pitch, max/min roll
+    values = np.column_stack([total_step_times, step_table[:,2:7]])
+
+    # Subtract the session average before adding up the squares - this keeps the std devs accurate for long sessions
+    session_averages = np.mean(values, axis=0)
+    values = values - session_averages
+    sums = np.vstack([np.zeros(6), np.cumsum(values, axis=0)])
+    squares = np.vstack([np.zeros(6), np.cumsum(values * values, axis=0)])
+    window_averages = (sums[window:] - sums[:-window]) / window
+    window_std_devs = np.sqrt(np.maximum((squares[window:] - squares[:-window]) / window - window_averages ** 2, 0))
+    window_averages += session_averages
+
+    step_time_average, foot_down_time_average, pitch_max, pitch_min, roll_max, roll_min = window_averages.T
+    step_time_std_dev, foot_down_time_std_dev, pitch_max_std_dev, pitch_min_std_dev, roll_max_std_dev, roll_min_std_dev = window_std_devs.T
+
+    return {
+        'window': window,
+        # The time (in seconds since the first step) at the end of each window
+        'time': list(np.round(step_table[window - 1:,1] - step_table[0,0], 2)),
+        # Each step is two footsteps (we only have data from one foot) so this is in steps per minute
+        'cadence': list(np.round(120 / step_time_average, 1)),
+        'step_time_average': list(np.round(step_time_average, 2)),
+        'step_time_std_dev': list(np.round(step_time_std_dev, 2)),
+        'foot_down_time_average': list(np.round(foot_down_time_average, 2)),
+        'foot_down_time_std_dev': list(np.round(foot_down_time_std_dev, 2)),
+        'percent_time_foot_down': list(np.round(foot_down_time_average / step_time_average * 100, 1)),
+        'pitch_range': [list(np.round(pitch_max, 1)), list(np.round(pitch_min, 1))],
+        'pitch_range_std_dev': [list(np.round(pitch_max_std_dev, 1)), list(np.round(pitch_min_std_dev, 1))],
+        'roll_range': [list(np.round(roll_max, 1)), list(np.round(roll_min, 1))],
+        'roll_range_std_dev': [list(np.round(roll_max_std_dev, 1)), list(np.round(roll_min_std_dev, 1))],
+    }
+
+
 def lambda_handler(event, context):
     logger.info("Event: " + json.dumps(event))
     method = event['routeKey'].split(" ")[0]
@@ -62,109 +452,14 @@ def lambda_handler(event, context):
                     # Since the data for the file exists, we're going to do analysis on it before
                     # sending it to the web UI
 
-                    # Read in the data and convert it into a numpy array that we can assess
-                    ankle_data_raw = json.loads(file_info['Item']['data'])
-                    logger.info(type(ankle_data_raw))
-                    ankle_data = np.array(ankle_data_raw)
-                    logger.info("Ankle Data:")
-                    logger.info(type(ankle_data))
-                    logger.info(ankle_data.shape)
-                    time_data = ankle_data[:,0]
-                    pitch_data = ankle_data[:,1]
-
-                    # We need to convert the roll data for right feet so that steps can be
-                    # compared between right and left feet (we want an outside roll to always
-                    # have the same cardinality regardless of which foot it is)
-                    if file_name[0:4] == "left":
-                        roll_data = ankle_data[:,2]
-                    else:
-                        roll_data = -ankle_data[:,2]
-                    
-                    # Smooth out the pitch readings and then calculate the peaks and troughs in the pitch
-                    # reading - we'll use these to calculate each step
-                    smoothed_pitch = scipy.ndimage.gaussian_filter1d(pitch_data, sigma=2)
-                    peaks, _ = find_peaks(pitch_data, prominence=1)
-                    troughs, _ = find_peaks(-pitch_data, prominence=1)
-                    
-                    # Create an array of points that includes the index of each peak/trough and whether it is a peak or trough
-                    points = [[int(time), "peak"] for time in peaks]
-                    points += [[int(time), "trough"] for time in troughs]
-                    # Sort this by index of the peak/trough
-                    points.sort(key=lambda x:x[0])
-                    
-                    steps = []
-                    step_times = []
-                    step_values = []
-                    total_step_times = []
-                    foot_down_times = []
-                    pitch_max = []
-                    pitch_min = []
-                    roll_max = []
-                    roll_min = []
-                    roll_values = []
-                    
-                    # We'll review the points to find steps
-                    for i in range(len(points) - 2):
-                        # We'll only consider steps as starting at a peak (this makes the analysis easier)
-                        if points[i][1] == "trough":
-                            continue
-
-                        # We're going to determine steps by looking at the next three points
-                        point_num, point_type = points[i]
-                        point_time = time_data[point_num]
-                        point_value = pitch_data[point_num]
-    
-                        next_num, next_type = points[i + 1]
-                        next_time = time_data[next_num]
-                        next_value = pitch_data[next_num]
-    
-                        two_num, two_type = points[i + 2]
-                        two_time = time_data[two_num]
-                        two_value = pitch_data[two_num]
-    
-                        # We'll define a steps as a peak-trough-peak pattern - if any of these are not met then skip
-                        # to the next point
-                        if point_type == "trough" or next_type == "peak" or two_type == "trough":
-                            continue
-    
-                        # The peak pitch must be >= 5 degrees and the trough pitch must be <= -50 degrees to be considered a step
-                        # This was determined imperically
-                        if point_value < 5 or next_value > -50 or two_value < 5:
-                            continue
-    
-                        # Check if the step is between 2 second and 0.5 seconds
-                        # Note - here step actually refers to two steps since we're only looking at data from one leg
-                        # This means that we're making sure the user is walking between 60 and 240 spm
-                        # Anything not in this range we won't consider a step (it's too inconcistent to get good data out of)
-                        step_time = two_time - point_time
-                        #The time was too fast or short to be a step
-                        if step_time > 2 or step_time < 0.5:
-                            continue
-    
-                        #Now we know it's a step!
+                    step_table, pitch_average, roll_average = get_steps(file_name, file_info['Item'])
+                    total_step_times = step_table[:,1] - step_table[:,0]
+                    foot_down_times = step_table[:,2]
+                    pitch_max = step_table[:,3]
+                    pitch_min = step_table[:,4]
+                    roll_max = step_table[:,5]
+                    roll_min = step_table[:,6]
 
-                        # Find and store the total time for the step, and the amount of time the foot was down
-                        # We're assuming that the foot is down between the peak and trough of the pitch
-
-                        # During the step your foot's pitch goes from it's maximum angle (when you start the step)
-                        # to it's minimum angle (when your foot leaves the ground and the step-off happens)
-                        steps.append((point_num, two_num))
-                        total_step_times.append(step_time)
-                        foot_down_times.append(next_time - point_time)
-    
-                        # Find and store the max/min roll angle for this step
-                        roll_max.append(np.max(roll_data[point_num:two_num]))
-                        roll_min.append(np.min(roll_data[point_num:two_num]))
-    
-                        # Find and store the max/min pitch angle for this step
-                        pitch_max.append(point_value)
-                        pitch_min.append(next_value)
-    
-                        # Store the pitch, roll, and time data for this step - we're later going to use this to calculate the "average" step
-                        step_values.append(pitch_data[point_num:two_num+1])
-                        roll_values.append(roll_data[point_num:two_num+1])
-                        step_times.append(time_data[point_num:two_num+1])
-                    
                     # Once we've found all of the steps, in the response object add information for the step count, average step time, etc.
                     # that we calculated above
                     response_body = file_info['Item']
@@ -176,32 +471,10 @@ def lambda_handler(event, context):
                     response_body['percent_time_foot_down'] = round(np.mean(foot_down_times) / np.mean(total_step_times) * 100, 1)
                     response_body['average_pitch_range'] = [round(np.mean(pitch_max), 1), round(np.mean(pitch_min), 1)]
                     response_body['average_roll_range'] = [round(np.mean(roll_max), 1), round(np.mean(roll_min), 1)]
-                    
-                    # We're going to break each step down into 20 pieces and then calculate the average pitch/roll across all steps
-                    # for each of those pieces.  This will allow us to later graph the average across all steps
-                    average_number_of_pieces = 20
-                    # We create empty lists to store the average pitch and roll data
-                    pitch_average = [[] for _ in range(average_number_of_pieces)]
-                    roll_average = [[] for _ in range(average_number_of_pieces)]
-                    # Calculate the start time for each of these 20 pieces (based on splitting the average step time into 30 intervals)
-                    pitch_average_time = [i * np.mean(total_step_times) / (average_number_of_pieces - 1) for i in range(average_number_of_pieces)]
-
-                    # Go through each point of each step and put it into the appropriate interval bucket in pitch_average and roll_average
-                    for i in range(len(step_values)):
-                        start_step_time = step_times[i][0]
-                        end_step_time = step_times[i][-1]
-                        step_amount = (end_step_time - start_step_time) / (average_number_of_pieces - 1)
-                        for j in range(len(step_values[i])):
-                            curr_time = step_times[i][j] - start_step_time
-                            list_element = int(curr_time / step_amount)
-                            pitch_average[list_element].append(step_values[i][j])
-                            roll_average[list_element].append(roll_values[i][j])
-                    
-                    # Calculate the average of all of the steps in each pitch_average and roll_average interval
-                    for i in range(len(pitch_average)):
-                        pitch_average[i] = sum(pitch_average[i]) / len(pitch_average[i])
-                        roll_average[i] = sum(roll_average[i]) / len(roll_average[i])
-                    
+
+                    # Calculate the start time for each of the 20 pieces of the average step (based on splitting the average step time into 19 intervals)
+                    pitch_average_time = [i * np.mean(total_step_times) / (len(pitch_average) - 1) for i in range(len(pitch_average))]
+
                     # Since we're only using 30 points, build a spine using this data to display a smoothed version of the data to the user
                     Pitch_Spline = make_interp_spline(pitch_average_time, pitch_average)
                     Time_ = np.linspace(np.min(pitch_average_time), np.max(pitch_average_time), 500)
@@ -221,6 +494,14 @@ def lambda_handler(event, context):
                     
                     # Do not include the raw data in the response (it's unnecessary now that we have data for the average step)
                     del(response_body['data'])
+                    if 'steps' in response_body:
+                        del(response_body['steps'])
+                        del(response_body['profile'])
+                    if 'timeline' in response_body:
+                        del(response_body['timeline'])
+                    if 'step-index' in response_body:
+                        del(response_body['step-index'])
+                        del(response_body['step-index-version'])
                     
                     logger.info(response_body)
                     
@@ -235,6 +516,165 @@ def lambda_handler(event, context):
                         'statusCode': 200,
                         'body': "Bad Data"
                     }
+
+        # If the timeline is requested we return rolling step metrics through the requested item (file)
+        # The window is the number of steps that each point in the timeline covers
+        elif path == "/items/{id}/timeline":
+            file_name = event['pathParameters']['id']
+            query = event.get('queryStringParameters') or {}
+            try:
+                window = int(query.get('window', 10))
+            except ValueError:
+                window = 0
+            file_info = table.get_item(
+                Key={'file-name': file_name}
+            )
+
+            if window < 1:
+                response = {
+                    'statusCode': 400,
+                    'body': 'Bad Request'
+                }
+            # Return a 404 error if we can't find the requested item (file)
+            elif 'Item' not in file_info:
+                response = {
+                    'statusCode': 404,
+                    'body': 'File not found'
+                }
+            else:
+                try:
+                    # The timeline for the web UI's window is cached with the item.  The data store Lambda replaces
+                    # the whole item when more of the file is stored, which clears out the cached timeline.
+                    item = file_info['Item']
+                    if window == TIMELINE_CACHE_WINDOW and 'timeline' in item:
+                        response_body = json.loads(item['timeline'])
+                    else:
+                        response_body = step_timeline(get_step_table(file_name, item), window)
+                        if window == TIMELINE_CACHE_WINDOW:
+                            condition, values = unchanged_condition(item)
+                            values[':tl'] = json.dumps(response_body, ignore_nan=True)
+                            try:
+                                # update_item creates the item if it doesn't exist, so make sure the file wasn't
+                                # deleted since we read it
+                                table.update_item(
+                                    Key={'file-name': file_name},
+                                    UpdateExpression='SET #tl = :tl',
+                                    ConditionExpression='attribute_exists(#fn) AND ' + condition,
+                                    ExpressionAttributeNames={
+                                        '#tl': 'timeline',
+                                        '#fn': 'file-name',
+                                        '#version': 'version'
+                                    },
+                                    ExpressionAttributeValues=values
+                                )
+                            except Exception as error:
+                                logger.info("Timeline not cached: " + str(error))
+
+                    response_body['file-name'] = file_name
+                    response = {
+                        'statusCode': 200,
+                        'body': json.dumps(response_body, ignore_nan=True)
+                    }
+
+                # If we get an error along the way there was likely an issue with the data (or no steps were identified)
+                except:
+                    response = {
+                        'statusCode': 200,
+                        'body': "Bad Data"
+                    }
+
+        # Return a page of the steps in the requested item (file) from its step index
+        elif path == "/items/{id}/steps":
+            file_name = event['pathParameters']['id']
+            query = event.get('queryStringParameters') or {}
+            try:
+                offset = int(query.get('offset', 0))
+                limit = int(query.get('limit', 100))
+            except ValueError:
+                offset = -1
+                limit = 0
+
+            if offset < 0 or limit < 1:
+                response = {
+                    'statusCode': 400,
+                    'body': 'Bad Request'
+                }
+            else:
+                try:
+                    item, index = get_step_index(file_name)
+                    # Return a 404 error if we can't find the requested item (file)
+                    if item is None:
+                        response = {
+                            'statusCode': 404,
+                            'body': 'File not found'
+                        }
+                    else:
+                        response_body = {
+                            'file-name': file_name,
+                            'step_count': len(index),
+                            'offset': offset,
+                            'limit': limit,
+                            'steps': [step_info(index, k) for k in range(offset, min(offset + limit, len(index)))]
+                        }
+                        response = {
+                            'statusCode': 200,
+                            'body': json.dumps(response_body, ignore_nan=True)
+                        }
+
+                # If we get an error along the way there was likely an issue with the data
+                except:
+                    response = {
+                        'statusCode': 200,
+                        'body': "Bad Data"
+                    }
+
+        # Return a single step in the requested item (file), including all of its readings
+        elif path == "/items/{id}/steps/{k}":
+            file_name = event['pathParameters']['id']
+            try:
+                k = int(event['pathParameters']['k'])
+            except ValueError:
+                k = -1
+
+            if k < 0:
+                response = {
+                    'statusCode': 400,
+                    'body': 'Bad Request'
+                }
+            else:
+                try:
+                    item, index = get_step_index(file_name, with_data=True)
+                    # Return a 404 error if we can't find the requested item (file) or step
+                    if item is None:
+                        response = {
+                            'statusCode': 404,
+                            'body': 'File not found'
+                        }
+                    elif k >= len(index):
+                        response = {
+                            'statusCode': 404,
+                            'body': 'Step not found'
+                        }
+                    else:
+                        # Only the readings for this step are read from the data
+                        ankle_data_raw = read_readings(item['data'], index['data_start'][k], index['data_end'][k])
+                        time_data, pitch_data, roll_data = read_ankle_data(file_name, ankle_data_raw)
+                        response_body = step_info(index, k)
+                        response_body['file-name'] = file_name
+                        response_body['time'] = list(time_data)
+                        response_body['pitch'] = list(pitch_data)
+                        response_body['roll'] = list(roll_data)
+                        response = {
+                            'statusCode': 200,
+                            'body': json.dumps(response_body, ignore_nan=True)
+                        }
+
+                # If we get an error along the way there was likely an issue with the data
+                except:
+                    response = {
+                        'statusCode': 200,
+                        'body': "Bad Data"
+                    }
         else:
             # Send a 400 error if this lambda function doesn't handle the requested path
             response = {
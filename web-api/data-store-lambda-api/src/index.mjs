@@ -72,6 +72,11 @@ export const handler = async (event, context) => {
           return [Number(time.toFixed(3)), Number(roll.toFixed(3)), Number(pitch.toFixed(3))];
         });
         
+        // Files recorded in edge mode also include per-step summaries found on the device
+        // [start time, end time, foot down time, max pitch, min pitch, max roll, min roll] and
+        // the average step across the whole recording
+        let newSteps = requestJSON.steps || [];
+
         // Check to see if we've stored part of this file before - this will determine whether we need to
         // append this data to existing data in the database
         let existing = await dynamo.send(
@@ -84,35 +89,63 @@ export const handler = async (event, context) => {
         );
 
         // If we haven't store this file before, store it now
+        // The version goes up every time part of the file is stored - the read Lambda only caches what it calculates
+        // for a file if the version hasn't changed since it read the file (edge mode step uploads don't add data points)
         if (!existing.Item) {
+          let item = {
+            'start-time': file_start_time,
+            'file-name': requestJSON.file_name,
+            'data-points': requestJSON.data_points,
+            'version': 1,
+            'data': JSON.stringify(newData)
+          };
+          if (requestJSON.steps) {
+            item['steps'] = JSON.stringify(newSteps);
+          }
+          if (requestJSON.profile) {
+            item['profile'] = JSON.stringify(requestJSON.profile);
+          }
           await dynamo.send(
             new PutCommand({
               TableName: tableName,
-              Item: {
-                'start-time': file_start_time,
-                'file-name': requestJSON.file_name,
-                'data-points': requestJSON.data_points,
-                'data': JSON.stringify(newData)
-              },
+              Item: item,
             })
           );
           body = `Received file: ${requestJSON.file_name}, Number of elements: ${requestJSON.data_points}, Total number of elements: ${requestJSON.data_points}`;
         
         // If we've stored this file before, we need to append the current data to the existing data
+        // (this replaces the whole item, which also clears out any timelines the read Lambda cached for the file)
         } else {
           let existing_data_points = existing.Item['data-points']
           let total_data_points = existing_data_points + requestJSON.data_points
           let existing_data = JSON.parse(existing.Item.data)
           let final_data = existing_data.concat(newData)
+          let item = {
+            'start-time': file_start_time,
+            'file-name': requestJSON.file_name,
+            'data-points': total_data_points,
+            'version': (existing.Item.version || 0) + 1,
+            'data': JSON.stringify(final_data)
+          };
+          if (existing.Item.steps || requestJSON.steps) {
+            let existing_steps = existing.Item.steps ? JSON.parse(existing.Item.steps) : [];
+            item['steps'] = JSON.stringify(existing_steps.concat(newSteps));
+          }
+          if (requestJSON.profile) {
+            item['profile'] = JSON.stringify(requestJSON.profile);
+          } else if (existing.Item.profile) {
+            item['profile'] = existing.Item.profile;
+          }
+          // Keep the step index the read Lambda built for the file (it only needs to look for steps in the new data)
+          // Edge mode step uploads don't add data, and their step index is built from all of the steps, so it's dropped
+          if (existing.Item['step-index'] && !requestJSON.steps && !requestJSON.profile) {
+            item['step-index'] = existing.Item['step-index'];
+            item['step-index-version'] = existing.Item['step-index-version'];
+          }
           await dynamo.send(
             new PutCommand({
               TableName: tableName,
-              Item: {
-                'start-time': file_start_time,
-                'file-name': requestJSON.file_name,
-                'data-points': total_data_points,
-                'data': JSON.stringify(final_data)
-              },
+              Item: item,
             })
           );
           body = `Received file: ${requestJSON.file_name}, Number of elements: ${requestJSON.data_points}, Total number of elements: ${total_data_points}`;